@@ -1,22 +1,25 @@
 ﻿from __future__ import annotations
 
 import argparse
-import json
 import sqlite3
 import sys
 from typing import Any
 
+import orjson
+
 from app.db import disable_license, enable_license, get_license, init_db, list_licenses
+from app.db_pool import close_pools
 from app.license_admin import create_license, format_license, generate_unique_key
 from app.settings import get_settings
 
 def _print_json(data: Any) -> None:
-    print(json.dumps(data, separators=(",", ":"), sort_keys=False))
+    sys.stdout.flush()
+    sys.stdout.buffer.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+    sys.stdout.buffer.flush()
 
 
 def _handle_create_license(args: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
 
     try:
         record = create_license(
@@ -42,7 +45,6 @@ def _handle_create_license(args: argparse.Namespace) -> int:
 
 def _handle_disable_license(args: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
 
     updated = disable_license(settings.db_path, args.key)
     if not updated:
@@ -55,7 +57,6 @@ def _handle_disable_license(args: argparse.Namespace) -> int:
 
 def _handle_enable_license(args: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
 
     updated = enable_license(settings.db_path, args.key)
     if not updated:
@@ -68,14 +69,12 @@ def _handle_enable_license(args: argparse.Namespace) -> int:
 
 def _handle_generate_key(_: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
     _print_json({"license_key": generate_unique_key(settings.db_path)})
     return 0
 
 
 def _handle_list_licenses(_: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
 
     records = list_licenses(settings.db_path)
     payload = [format_license(record) for record in records]
@@ -85,7 +84,6 @@ def _handle_list_licenses(_: argparse.Namespace) -> int:
 
 def _handle_show_license(args: argparse.Namespace) -> int:
     settings = get_settings()
-    init_db(settings.db_path)
 
     record = get_license(settings.db_path, args.key)
     if record is None:
@@ -130,7 +128,11 @@ def build_parser() -> argparse.ArgumentParser:
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
-    return int(args.handler(args))
+    try:
+        init_db(get_settings().db_path)
+        return int(args.handler(args))
+    finally:
+        close_pools()
 
 
 if __name__ == "__main__":
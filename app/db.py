@@ -1,33 +1,163 @@
 ﻿from __future__ import annotations
 
 import sqlite3
-from pathlib import Path
-
-from app.models import LicenseRecord
-
-
-def connect(db_path: str) -> sqlite3.Connection:
-    path = Path(db_path).expanduser()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def init_db(db_path: str) -> None:
-    with connect(db_path) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS licenses (
-                license_key TEXT PRIMARY KEY,
-                issued_at TEXT NOT NULL,
-                duration_days INTEGER NOT NULL CHECK(duration_days >= 1),
-                status TEXT NOT NULL CHECK(status IN ('active', 'disabled')),
-                note TEXT NULL
-            )
-            """
-        )
-        conn.commit()
+import threading
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Literal
+
+from app.db_pool import get_pool, transaction
+from app.models import EnableOutcome, LicenseExpiryRecord, LicenseRecord
+
+_CREATE_LICENSES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS licenses (
+        license_key TEXT PRIMARY KEY,
+        issued_at TEXT NOT NULL,
+        duration_days INTEGER NOT NULL CHECK(duration_days >= 1),
+        status TEXT NOT NULL CHECK(status IN ('active', 'disabled')),
+        note TEXT NULL
+    )
+    """
+
+_CREATE_LICENSES_ORDER_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_licenses_issued_at_key
+    ON licenses (issued_at DESC, license_key ASC, duration_days, status, note)
+    """
+
+_SELECT_LICENSE_SQL = """
+    SELECT license_key, issued_at, duration_days, status, note
+    FROM licenses
+    WHERE license_key = ?
+    """
+
+_UPDATE_LICENSE_DURATION_SQL = """
+    UPDATE licenses
+    SET issued_at = ?, duration_days = ?
+    WHERE license_key = ?
+    """
+
+_SET_LICENSE_STATUS_SQL = """
+    UPDATE licenses
+    SET status = ?
+    WHERE license_key = ? AND status <> ?
+    RETURNING license_key
+    """
+
+_LICENSE_EXISTS_SQL = """
+    SELECT 1
+    FROM licenses
+    WHERE license_key = ?
+    """
+
+_EXISTING_LICENSE_KEYS_SQL = """
+    SELECT license_key
+    FROM licenses
+    WHERE license_key IN ({placeholders})
+    """
+
+_LIST_LICENSES_SQL = """
+    SELECT license_key, issued_at, duration_days, status, note
+    FROM licenses
+    ORDER BY issued_at DESC, license_key ASC
+    """
+
+_SECONDS_REMAINING_SQL = """
+    CAST(strftime('%s', issued_at, '+' || duration_days || ' days') AS INTEGER)
+        - CAST(strftime('%s', :now) AS INTEGER)
+    """
+
+_LICENSE_EXPIRY_COLUMNS_SQL = f"""
+    license_key,
+    issued_at,
+    duration_days,
+    status,
+    note,
+    strftime('%Y-%m-%dT%H:%M:%SZ', issued_at) AS issued_at_rfc3339,
+    strftime('%Y-%m-%dT%H:%M:%SZ', issued_at, '+' || duration_days || ' days')
+        AS license_expires_at,
+    {_SECONDS_REMAINING_SQL} AS seconds_remaining
+    """
+
+_LIST_LICENSES_WITH_EXPIRY_SQL = f"""
+    SELECT {_LICENSE_EXPIRY_COLUMNS_SQL}
+    FROM licenses
+    ORDER BY issued_at DESC, license_key ASC
+    """
+
+_SELECT_LICENSE_WITH_EXPIRY_SQL = f"""
+    SELECT {_LICENSE_EXPIRY_COLUMNS_SQL}
+    FROM licenses
+    WHERE license_key = :key
+    """
+
+# WHERE sees the pre-update row, RETURNING the updated one. The two statements match
+# disjoint rows (expired vs. not), so at most one of them writes.
+_REACTIVATE_EXPIRED_LICENSE_SQL = f"""
+    UPDATE licenses
+    SET issued_at = :now, duration_days = :duration_days, status = 'active'
+    WHERE license_key = :key
+        AND ({_SECONDS_REMAINING_SQL}) <= 0
+    RETURNING {_LICENSE_EXPIRY_COLUMNS_SQL}
+    """
+
+_ENABLE_UNEXPIRED_LICENSE_SQL = f"""
+    UPDATE licenses
+    SET status = 'active'
+    WHERE license_key = :key
+        AND status <> 'active'
+        AND ({_SECONDS_REMAINING_SQL}) > 0
+    RETURNING {_LICENSE_EXPIRY_COLUMNS_SQL}
+    """
+
+_INSERT_LICENSE_SQL = {
+    "fail": """
+        INSERT INTO licenses (license_key, issued_at, duration_days, status, note)
+        VALUES (?, ?, ?, ?, ?)
+        RETURNING license_key
+        """,
+    # Only a duplicate key is skipped; CHECK/NOT NULL violations still raise.
+    "ignore": """
+        INSERT INTO licenses (license_key, issued_at, duration_days, status, note)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (license_key) DO NOTHING
+        RETURNING license_key
+        """,
+}
+
+# executemany() cannot run statements that return rows, so bulk inserts skip RETURNING.
+_INSERT_LICENSES_SQL = """
+    INSERT INTO licenses (license_key, issued_at, duration_days, status, note)
+    VALUES (?, ?, ?, ?, ?)
+    """
+
+_initialized_paths: set[str] = set()
+_initialized_lock = threading.Lock()
+
+
+@contextmanager
+def _connection(db_path: str, conn: sqlite3.Connection | None) -> Iterator[sqlite3.Connection]:
+    if conn is not None:
+        yield conn
+        return
+
+    with get_pool(db_path).connection() as pooled_conn:
+        yield pooled_conn
+
+
+def init_db(db_path: str, *, conn: sqlite3.Connection | None = None) -> None:
+    # Schema setup is idempotent, so pooled callers only pay for it once per path.
+    if conn is None and db_path in _initialized_paths:
+        return
+
+    with _initialized_lock:
+        if conn is None and db_path in _initialized_paths:
+            return
+
+        with _connection(db_path, conn) as conn, transaction(conn):
+            conn.execute(_CREATE_LICENSES_TABLE_SQL)
+            conn.execute(_CREATE_LICENSES_ORDER_INDEX_SQL)
+
+        _initialized_paths.add(db_path)
 
 
 def _row_to_license(row: sqlite3.Row) -> LicenseRecord:
@@ -40,16 +170,23 @@ def _row_to_license(row: sqlite3.Row) -> LicenseRecord:
     )
 
 
-def get_license(db_path: str, key: str) -> LicenseRecord | None:
-    with connect(db_path) as conn:
-        row = conn.execute(
-            """
-            SELECT license_key, issued_at, duration_days, status, note
-            FROM licenses
-            WHERE license_key = ?
-            """,
-            (key,),
-        ).fetchone()
+def _row_to_expiry_record(row: sqlite3.Row) -> LicenseExpiryRecord:
+    return LicenseExpiryRecord(
+        license=_row_to_license(row),
+        issued_at=row["issued_at_rfc3339"],
+        license_expires_at=row["license_expires_at"],
+        seconds_remaining=int(row["seconds_remaining"]),
+    )
+
+
+def get_license(
+    db_path: str,
+    key: str,
+    *,
+    conn: sqlite3.Connection | None = None,
+) -> LicenseRecord | None:
+    with _connection(db_path, conn) as conn:
+        row = conn.execute(_SELECT_LICENSE_SQL, (key,)).fetchone()
 
     if row is None:
         return None
@@ -57,13 +194,16 @@ def get_license(db_path: str, key: str) -> LicenseRecord | None:
     return _row_to_license(row)
 
 
-def insert_license(db_path: str, record: LicenseRecord) -> None:
-    with connect(db_path) as conn:
-        conn.execute(
-            """
-            INSERT INTO licenses (license_key, issued_at, duration_days, status, note)
-            VALUES (?, ?, ?, ?, ?)
-            """,
+def insert_license(
+    db_path: str,
+    record: LicenseRecord,
+    *,
+    on_conflict: Literal["fail", "ignore"] = "fail",
+    conn: sqlite3.Connection | None = None,
+) -> bool:
+    with _connection(db_path, conn) as conn, transaction(conn):
+        inserted = conn.execute(
+            _INSERT_LICENSE_SQL[on_conflict],
             (
                 record.license_key,
                 record.issued_at,
@@ -71,31 +211,68 @@ def insert_license(db_path: str, record: LicenseRecord) -> None:
                 record.status,
                 record.note,
             ),
+        ).fetchone()
+
+    return inserted is not None
+
+
+def insert_licenses(
+    db_path: str,
+    records: Iterable[LicenseRecord],
+    *,
+    conn: sqlite3.Connection | None = None,
+) -> int:
+    with _connection(db_path, conn) as conn, transaction(conn):
+        cursor = conn.executemany(
+            _INSERT_LICENSES_SQL,
+            (
+                (
+                    record.license_key,
+                    record.issued_at,
+                    record.duration_days,
+                    record.status,
+                    record.note,
+                )
+                for record in records
+            ),
         )
-        conn.commit()
 
+    return cursor.rowcount
 
-def disable_license(db_path: str, key: str) -> bool:
-    return _set_license_status(db_path, key, "disabled")
 
+def disable_license(db_path: str, key: str, *, conn: sqlite3.Connection | None = None) -> bool:
+    return _set_license_status(db_path, key, "disabled", conn=conn)
 
-def enable_license(db_path: str, key: str) -> bool:
-    return _set_license_status(db_path, key, "active")
 
+def enable_license(db_path: str, key: str, *, conn: sqlite3.Connection | None = None) -> bool:
+    return _set_license_status(db_path, key, "active", conn=conn)
 
-def reactivate_license(db_path: str, key: str, *, issued_at: str, duration_days: int) -> bool:
-    with connect(db_path) as conn:
-        cursor = conn.execute(
-            """
-            UPDATE licenses
-            SET issued_at = ?, duration_days = ?, status = 'active'
-            WHERE license_key = ?
-            """,
-            (issued_at, duration_days, key),
-        )
-        conn.commit()
 
-    return cursor.rowcount > 0
+def enable_or_reactivate_license(
+    db_path: str,
+    key: str,
+    *,
+    now_rfc3339: str,
+    duration_days: int | None,
+    conn: sqlite3.Connection | None = None,
+) -> tuple[EnableOutcome, LicenseExpiryRecord] | None:
+    params = {"key": key, "now": now_rfc3339, "duration_days": duration_days}
+    outcome: EnableOutcome
+    row = None
+    with _connection(db_path, conn) as conn, transaction(conn):
+        # Without a duration an expired license cannot be reactivated, so skip that write.
+        if duration_days is not None:
+            outcome = "reactivated"
+            row = conn.execute(_REACTIVATE_EXPIRED_LICENSE_SQL, params).fetchone()
+        if row is None:
+            outcome = "enabled"
+            row = conn.execute(_ENABLE_UNEXPIRED_LICENSE_SQL, params).fetchone()
+        if row is None:
+            # Nothing was written: unknown key, already active, or expired without a new duration.
+            outcome = "unchanged"
+            row = conn.execute(_SELECT_LICENSE_WITH_EXPIRY_SQL, params).fetchone()
+
+    return None if row is None else (outcome, _row_to_expiry_record(row))
 
 
 def update_license_duration(
@@ -104,44 +281,61 @@ def update_license_duration(
     *,
     issued_at: str,
     duration_days: int,
+    conn: sqlite3.Connection | None = None,
 ) -> bool:
-    with connect(db_path) as conn:
-        cursor = conn.execute(
-            """
-            UPDATE licenses
-            SET issued_at = ?, duration_days = ?
-            WHERE license_key = ?
-            """,
-            (issued_at, duration_days, key),
-        )
-        conn.commit()
+    with _connection(db_path, conn) as conn, transaction(conn):
+        cursor = conn.execute(_UPDATE_LICENSE_DURATION_SQL, (issued_at, duration_days, key))
 
     return cursor.rowcount > 0
 
 
-def _set_license_status(db_path: str, key: str, status: str) -> bool:
-    with connect(db_path) as conn:
-        cursor = conn.execute(
-            """
-            UPDATE licenses
-            SET status = ?
-            WHERE license_key = ?
-            """,
-            (status, key),
-        )
-        conn.commit()
+def _set_license_status(
+    db_path: str,
+    key: str,
+    status: str,
+    *,
+    conn: sqlite3.Connection | None = None,
+) -> bool:
+    with _connection(db_path, conn) as conn:
+        with transaction(conn):
+            updated = conn.execute(_SET_LICENSE_STATUS_SQL, (status, key, status)).fetchone()
 
-    return cursor.rowcount > 0
+        if updated is not None:
+            return True
+
+        # Nothing was written: either the key is unknown or it already has this status.
+        return conn.execute(_LICENSE_EXISTS_SQL, (key,)).fetchone() is not None
 
 
-def list_licenses(db_path: str) -> list[LicenseRecord]:
-    with connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT license_key, issued_at, duration_days, status, note
-            FROM licenses
-            ORDER BY issued_at DESC, license_key ASC
-            """
-        ).fetchall()
+def existing_license_keys(
+    db_path: str,
+    keys: Sequence[str],
+    *,
+    conn: sqlite3.Connection | None = None,
+) -> set[str]:
+    if not keys:
+        return set()
+
+    sql = _EXISTING_LICENSE_KEYS_SQL.format(placeholders=", ".join("?" * len(keys)))
+    with _connection(db_path, conn) as conn:
+        rows = conn.execute(sql, tuple(keys)).fetchall()
+    return {row["license_key"] for row in rows}
+
+
+def list_licenses(db_path: str, *, conn: sqlite3.Connection | None = None) -> list[LicenseRecord]:
+    with _connection(db_path, conn) as conn:
+        rows = conn.execute(_LIST_LICENSES_SQL).fetchall()
 
     return [_row_to_license(row) for row in rows]
+
+
+def list_licenses_with_expiry(
+    db_path: str,
+    now_rfc3339: str,
+    *,
+    conn: sqlite3.Connection | None = None,
+) -> list[LicenseExpiryRecord]:
+    with _connection(db_path, conn) as conn:
+        rows = conn.execute(_LIST_LICENSES_WITH_EXPIRY_SQL, {"now": now_rfc3339}).fetchall()
+
+    return [_row_to_expiry_record(row) for row in rows]
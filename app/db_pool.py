@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+_CLOSED_POLL_SECONDS = 0.5
+
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA busy_timeout = 30000",
+)
+
+
+def _prepare_path(db_path: str) -> Path:
+    path = Path(db_path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _configure_connection(conn: sqlite3.Connection) -> None:
+    journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if str(journal_mode).lower() != "wal":
+        raise RuntimeError(f"Failed to enable WAL journal mode (got {journal_mode!r})")
+
+    for pragma in _CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
+class _PooledConnection(sqlite3.Connection):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # Held for the whole checkout, so a connection is never shared between threads.
+        self.lock = threading.Lock()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # Pooled connections run in autocommit mode; writers take the write lock up front
+    # instead of upgrading a deferred read transaction.
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, size: int = POOL_SIZE) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+
+        self._path = _prepare_path(db_path)
+        self._size = size
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._idle: queue.LifoQueue[_PooledConnection] = queue.LifoQueue(maxsize=size)
+
+    def _open(self) -> _PooledConnection:
+        conn = sqlite3.connect(
+            self._path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=_PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        try:
+            _configure_connection(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _checked_out(self, conn: _PooledConnection) -> _PooledConnection:
+        # close() may have run after the idle queue handed this connection over.
+        if self._closed:
+            self._discard(conn)
+            raise RuntimeError("Connection pool is closed")
+        return conn
+
+    def _checkout(self) -> _PooledConnection:
+        try:
+            return self._checked_out(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            can_open = self._opened < self._size
+            if can_open:
+                self._opened += 1
+
+        # Waiters wake up periodically so close() cannot leave them blocked forever.
+        while not can_open:
+            try:
+                return self._checked_out(self._idle.get(timeout=_CLOSED_POLL_SECONDS))
+            except queue.Empty:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed") from None
+
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def acquire(self) -> _PooledConnection:
+        conn = self._checkout()
+        conn.lock.acquire()
+        return conn
+
+    def release(self, conn: _PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            conn.lock.release()
+            # Checked and queued under the lock, so close() either drains it or sees it here.
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._idle.put_nowait(conn)
+            if closed:
+                self._discard(conn)
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        conn.close()
+        with self._lock:
+            self._opened -= 1
+
+    def close(self) -> None:
+        # Closing the last connection checkpoints the WAL and removes the -wal/-shm files.
+        # Connections still checked out are closed when they are released.
+        with self._lock:
+            self._closed = True
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = ConnectionPool(db_path)
+                _pools[db_path] = pool
+    return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
@@ -1,46 +1,60 @@
 from __future__ import annotations
 
-import sqlite3
 import secrets
-from datetime import timedelta
+import sqlite3
+from datetime import datetime, timedelta
 from typing import Any
 
-from app.db import get_license, insert_license
+from app.db import existing_license_keys, insert_license
 from app.models import LicenseRecord
-from app.service import parse_rfc3339, to_rfc3339, utc_now
+from app.service import is_canonical_rfc3339, parse_rfc3339, to_rfc3339, utc_now
 
 KEY_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
 KEY_SEGMENT_LENGTH = 4
 KEY_SEGMENTS = 3
 KEY_GENERATION_ATTEMPTS = 100
+KEY_CANDIDATE_BATCH_SIZE = 16
+KEY_LENGTH = KEY_SEGMENTS * KEY_SEGMENT_LENGTH
+
+# 256 is a multiple of len(KEY_ALPHABET), so mapping random bytes through this
+# table picks every alphabet character with equal probability.
+_KEY_BYTE_TABLE = bytes(ord(KEY_ALPHABET[byte % len(KEY_ALPHABET)]) for byte in range(256))
+
+
+def _canonical_issued_at(record: LicenseRecord, issued_at: datetime) -> str:
+    if is_canonical_rfc3339(record.issued_at):
+        return record.issued_at
+    return to_rfc3339(issued_at)
 
 
 def format_license(record: LicenseRecord) -> dict[str, Any]:
     issued_at = parse_rfc3339(record.issued_at)
-    license_expires_at = issued_at + timedelta(days=record.duration_days)
     return {
         "license_key": record.license_key,
-        "issued_at": to_rfc3339(issued_at),
+        "issued_at": _canonical_issued_at(record, issued_at),
         "duration_days": record.duration_days,
-        "license_expires_at": to_rfc3339(license_expires_at),
+        "license_expires_at": to_rfc3339(issued_at + timedelta(days=record.duration_days)),
         "status": record.status,
         "note": record.note,
     }
 
 
 def generate_key() -> str:
-    segments: list[str] = []
-    for _ in range(KEY_SEGMENTS):
-        segment = "".join(secrets.choice(KEY_ALPHABET) for _ in range(KEY_SEGMENT_LENGTH))
-        segments.append(segment)
-    return "-".join(segments)
+    chars = secrets.token_bytes(KEY_LENGTH).translate(_KEY_BYTE_TABLE).decode("ascii")
+    return "-".join(
+        chars[offset : offset + KEY_SEGMENT_LENGTH]
+        for offset in range(0, KEY_LENGTH, KEY_SEGMENT_LENGTH)
+    )
 
 
-def generate_unique_key(db_path: str) -> str:
-    for _ in range(KEY_GENERATION_ATTEMPTS):
-        candidate_key = generate_key()
-        if get_license(db_path, candidate_key) is None:
-            return candidate_key
+def generate_unique_key(db_path: str, *, conn: sqlite3.Connection | None = None) -> str:
+    # Check a whole batch of candidates with one query instead of one lookup per key.
+    for _ in range(0, KEY_GENERATION_ATTEMPTS, KEY_CANDIDATE_BATCH_SIZE):
+        candidate_keys = [generate_key() for _ in range(KEY_CANDIDATE_BATCH_SIZE)]
+        taken_keys = existing_license_keys(db_path, candidate_keys, conn=conn)
+        for candidate_key in candidate_keys:
+            if candidate_key not in taken_keys:
+                return candidate_key
     raise RuntimeError("Failed to generate a unique license key")
 
 
@@ -50,6 +64,7 @@ def create_license(
     days: int,
     key: str | None = None,
     note: str | None = None,
+    conn: sqlite3.Connection | None = None,
 ) -> LicenseRecord:
     if days < 1:
         raise ValueError("--days must be >= 1")
@@ -68,7 +83,7 @@ def create_license(
             status="active",
             note=normalized_note,
         )
-        insert_license(db_path, record)
+        insert_license(db_path, record, conn=conn)
         return record
 
     for _ in range(KEY_GENERATION_ATTEMPTS):
@@ -80,10 +95,7 @@ def create_license(
             status="active",
             note=normalized_note,
         )
-        try:
-            insert_license(db_path, candidate)
+        if insert_license(db_path, candidate, on_conflict="ignore", conn=conn):
             return candidate
-        except sqlite3.IntegrityError:
-            continue
 
     raise RuntimeError("Failed to generate a unique license key")
@@ -8,7 +8,9 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from app.db import init_db
+from app.db_pool import close_pools
 from app.models import TokenAllowedResponse, TokenDeniedResponse, TokenRequest
+from app.responses import ORJSONResponse, QualityGZipMiddleware
 from app.service import issue_token
 from app.settings import get_settings
 from app.web_admin import router as admin_router
@@ -21,22 +23,34 @@ async def lifespan(_: FastAPI):
     settings = get_settings()
     init_db(settings.db_path)
     yield
+    close_pools()
 
 
-app = FastAPI(title="CCM License Server MVP", lifespan=lifespan)
+app = FastAPI(
+    title="CCM License Server MVP",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+app.add_middleware(QualityGZipMiddleware, minimum_size=512)
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 app.include_router(admin_router)
 
 
-@app.post("/v1/token", response_model=TokenAllowedResponse | TokenDeniedResponse)
-def create_token(request: TokenRequest) -> TokenAllowedResponse | TokenDeniedResponse:
+@app.post(
+    "/v1/token",
+    response_model=TokenAllowedResponse | TokenDeniedResponse,
+    response_class=ORJSONResponse,
+)
+def create_token(request: TokenRequest) -> ORJSONResponse:
     settings = get_settings()
-    return issue_token(
-        db_path=settings.db_path,
-        token_ttl_seconds=settings.token_ttl_seconds,
-        license_key=request.license_key,
-        app_id=request.app_id,
-        app_version=request.app_version,
+    return ORJSONResponse(
+        issue_token(
+            db_path=settings.db_path,
+            token_ttl_seconds=settings.token_ttl_seconds,
+            license_key=request.license_key,
+            app_id=request.app_id,
+            app_version=request.app_version,
+        )
     )
 
 
@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 
 StatusType = Literal["active", "disabled"]
 DeniedReason = Literal["not_found", "disabled", "expired"]
+EnableOutcome = Literal["reactivated", "enabled", "unchanged"]
 
 
 @dataclass(frozen=True)
@@ -19,6 +20,18 @@ class LicenseRecord:
     note: str | None = None
 
 
+@dataclass(frozen=True)
+class LicenseExpiryRecord:
+    license: LicenseRecord
+    issued_at: str
+    license_expires_at: str
+    seconds_remaining: int
+
+    @property
+    def is_expired(self) -> bool:
+        return self.seconds_remaining <= 0
+
+
 class TokenRequest(BaseModel):
     license_key: str = Field(min_length=1)
     app_id: str | None = None
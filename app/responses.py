@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    wildcard_allowed = False
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        # An explicit gzip entry wins over the wildcard.
+        if coding == "gzip":
+            return quality > 0
+        wildcard_allowed = quality > 0
+    return wildcard_allowed
+
+
+def _without_gzip(accept_encoding: str) -> str:
+    # The wildcard goes too, so the refusal still holds for anything reading the rewritten header.
+    kept = []
+    for entry in accept_encoding.split(","):
+        coding = entry.partition(";")[0].strip().lower()
+        if coding not in ("gzip", "*"):
+            kept.append(entry.strip())
+    return ", ".join(kept)
+
+
+class QualityGZipMiddleware(GZipMiddleware):
+    # Starlette only looks for a "gzip" substring, so "gzip;q=0" would still be compressed.
+    # Refused gzip is removed from the header instead of reimplementing the responder dispatch.
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+            if "gzip" in accept_encoding and not accepts_gzip(accept_encoding):
+                scope = dict(scope)
+                scope["headers"] = [
+                    (name, _without_gzip(value.decode("latin-1")).encode("latin-1"))
+                    if name == b"accept-encoding"
+                    else (name, value)
+                    for name, value in scope["headers"]
+                ]
+
+        await super().__call__(scope, receive, send)
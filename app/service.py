@@ -1,11 +1,27 @@
 ﻿from __future__ import annotations
 
-import calendar
+import os
 from datetime import datetime, timedelta, timezone
-from uuid import uuid4
+from functools import lru_cache
+from typing import Any
 
 from app.db import get_license
-from app.models import DeniedReason, LeaseInfo, LicenseInfo, TokenAllowedResponse, TokenDeniedResponse
+from app.models import DeniedReason
+
+_ONE_SECOND = timedelta(seconds=1)
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# No calendar month is shorter than this, so smaller spans never contain a whole month.
+SHORTEST_MONTH_SECONDS = 28 * 86400
+
+_REMAINING_TIME_UNITS = (
+    ("years", "y"),
+    ("months", "mo"),
+    ("days", "d"),
+    ("hours", "h"),
+    ("minutes", "m"),
+    ("seconds", "s"),
+)
 
 
 def utc_now() -> datetime:
@@ -13,11 +29,48 @@ def utc_now() -> datetime:
 
 
 def to_rfc3339(value: datetime) -> str:
+    if value.tzinfo is timezone.utc and value.microsecond == 0:
+        return value.isoformat().replace("+00:00", "Z")
+
     utc_value = value.astimezone(timezone.utc).replace(microsecond=0)
     return utc_value.isoformat().replace("+00:00", "Z")
 
 
+def is_canonical_rfc3339(value: str) -> bool:
+    return (
+        len(value) == 20
+        and value[19] == "Z"
+        and value[4] == "-"
+        and value[7] == "-"
+        and value[10] == "T"
+        and value[13] == ":"
+        and value[16] == ":"
+    )
+
+
+def _parse_canonical_rfc3339(value: str) -> datetime | None:
+    digits = value[0:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16] + value[17:19]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+
+    return datetime(
+        int(value[0:4]),
+        int(value[5:7]),
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+        tzinfo=timezone.utc,
+    )
+
+
 def parse_rfc3339(value: str) -> datetime:
+    # Everything the app writes is YYYY-MM-DDTHH:MM:SSZ; slice that shape directly.
+    if is_canonical_rfc3339(value):
+        parsed = _parse_canonical_rfc3339(value)
+        if parsed is not None:
+            return parsed
+
     candidate = value.strip()
     if candidate.endswith("Z"):
         candidate = f"{candidate[:-1]}+00:00"
@@ -36,7 +89,10 @@ def _add_months(value: datetime, months: int) -> datetime:
     year_offset, month_index = divmod((value.month - 1) + months, 12)
     year = value.year + year_offset
     month = month_index + 1
-    day = min(value.day, calendar.monthrange(year, month)[1])
+    days_in_month = _DAYS_IN_MONTH[month_index]
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        days_in_month = 29
+    day = min(value.day, days_in_month)
     return value.replace(year=year, month=month, day=day)
 
 
@@ -51,25 +107,25 @@ def split_remaining_time(now: datetime, expires_at: datetime) -> dict[str, int]:
             "seconds": 0,
         }
 
-    cursor = now
-    years = 0
-    while True:
-        next_cursor = _add_months(cursor, 12)
-        if next_cursor > expires_at:
-            break
-        years += 1
-        cursor = next_cursor
-
-    months = 0
-    while True:
-        next_cursor = _add_months(cursor, 1)
-        if next_cursor > expires_at:
-            break
-        months += 1
-        cursor = next_cursor
-
-    remaining_seconds = max(0, int((expires_at - cursor).total_seconds()))
-    days, remainder = divmod(remaining_seconds, 86400)
+    total_months = (expires_at.year - now.year) * 12 + (expires_at.month - now.month)
+    cursor = _add_months(now, total_months)
+    if cursor > expires_at:
+        total_months -= 1
+        cursor = _add_months(now, total_months)
+
+    years, months = divmod(total_months, 12)
+    return _split_seconds(years, months, (expires_at - cursor) // _ONE_SECOND)
+
+
+def split_remaining_seconds(seconds_remaining: int) -> dict[str, int]:
+    if seconds_remaining >= SHORTEST_MONTH_SECONDS:
+        raise ValueError("seconds_remaining may span whole months; use split_remaining_time")
+
+    return _split_seconds(0, 0, seconds_remaining)
+
+
+def _split_seconds(years: int, months: int, remaining_seconds: int) -> dict[str, int]:
+    days, remainder = divmod(max(0, remaining_seconds), 86400)
     hours, remainder = divmod(remainder, 3600)
     minutes, seconds = divmod(remainder, 60)
 
@@ -83,31 +139,37 @@ def split_remaining_time(now: datetime, expires_at: datetime) -> dict[str, int]:
     }
 
 
+@lru_cache(maxsize=4096)
+def _format_remaining_components(components: tuple[int, ...]) -> str:
+    parts = [
+        f"{value}{suffix}"
+        for value, (_, suffix) in zip(components, _REMAINING_TIME_UNITS)
+        if value > 0
+    ]
+    return " ".join(parts) if parts else "0s"
+
+
 def format_remaining_time(remaining_time: dict[str, int]) -> str:
-    parts: list[str] = []
-    units = (
-        ("years", "y"),
-        ("months", "mo"),
-        ("days", "d"),
-        ("hours", "h"),
-        ("minutes", "m"),
-        ("seconds", "s"),
-    )
+    # Rows sharing a remaining-time bucket reuse the same label.
+    components = tuple(int(remaining_time.get(key, 0)) for key, _ in _REMAINING_TIME_UNITS)
+    return _format_remaining_components(components)
 
-    for key, suffix in units:
-        value = int(remaining_time.get(key, 0))
-        if value > 0:
-            parts.append(f"{value}{suffix}")
 
-    return " ".join(parts) if parts else "0s"
+def _new_lease_id() -> str:
+    # Random (version 4) UUID in its canonical dashed form, without building a UUID object.
+    raw = bytearray(os.urandom(16))
+    raw[6] = (raw[6] & 0x0F) | 0x40
+    raw[8] = (raw[8] & 0x3F) | 0x80
+    value = raw.hex()
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
 
 
-def _denied(reason: DeniedReason, now: datetime) -> TokenDeniedResponse:
-    return TokenDeniedResponse(
-        allowed=False,
-        reason=reason,
-        server_time=to_rfc3339(now),
-    )
+def _denied(reason: DeniedReason, server_time: str) -> dict[str, Any]:
+    return {
+        "allowed": False,
+        "reason": reason,
+        "server_time": server_time,
+    }
 
 
 def issue_token(
@@ -116,40 +178,41 @@ def issue_token(
     license_key: str,
     app_id: str | None = None,
     app_version: str | None = None,
-) -> TokenAllowedResponse | TokenDeniedResponse:
+) -> dict[str, Any]:
     del app_id, app_version
 
     now = utc_now()
+    server_time = to_rfc3339(now)
     record = get_license(db_path, license_key)
     if record is None:
-        return _denied("not_found", now)
+        return _denied("not_found", server_time)
 
     if record.status == "disabled":
-        return _denied("disabled", now)
+        return _denied("disabled", server_time)
 
     issued_at = parse_rfc3339(record.issued_at)
     license_expires_dt = issued_at + timedelta(days=record.duration_days)
     if now >= license_expires_dt:
-        return _denied("expired", now)
+        return _denied("expired", server_time)
 
     lease_issued_at = now
     lease_expires_at = lease_issued_at + timedelta(seconds=token_ttl_seconds)
     remaining_time = split_remaining_time(now, license_expires_dt)
 
-    return TokenAllowedResponse(
-        allowed=True,
-        lease=LeaseInfo(
-            lease_id=str(uuid4()),
-            issued_at=to_rfc3339(lease_issued_at),
-            expires_at=to_rfc3339(lease_expires_at),
-        ),
-        license=LicenseInfo(
-            license_key=record.license_key,
-            issued_at=to_rfc3339(issued_at),
-            duration_days=record.duration_days,
-            license_expires_at=to_rfc3339(license_expires_dt),
-            remaining_time=remaining_time,
-        ),
-        token_ttl_seconds=token_ttl_seconds,
-        server_time=to_rfc3339(now),
-    )
+    return {
+        "allowed": True,
+        "lease": {
+            "lease_id": _new_lease_id(),
+            "issued_at": server_time,
+            "expires_at": to_rfc3339(lease_expires_at),
+        },
+        "license": {
+            "license_key": record.license_key,
+            "issued_at": to_rfc3339(issued_at),
+            "duration_days": record.duration_days,
+            "license_expires_at": to_rfc3339(license_expires_dt),
+            "remaining_time": remaining_time,
+        },
+        "token_ttl_seconds": token_ttl_seconds,
+        "server_time": server_time,
+    }
@@ -2,6 +2,10 @@
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
+
+_TRUE_VALUES = frozenset({"1", "true", "yes", "on"})
+_FALSE_VALUES = frozenset({"", "0", "false", "no", "off"})
 
 
 @dataclass(frozen=True)
@@ -12,6 +16,7 @@ class Settings:
     port: int
     admin_username: str | None
     admin_password: str | None
+    debug: bool
 
     @property
     def admin_enabled(self) -> bool:
@@ -25,6 +30,15 @@ def _parse_int(value: str, name: str) -> int:
         raise ValueError(f"{name} must be an integer") from exc
 
 
+def _parse_bool(value: str, name: str) -> bool:
+    candidate = value.strip().lower()
+    if candidate in _TRUE_VALUES:
+        return True
+    if candidate in _FALSE_VALUES:
+        return False
+    raise ValueError(f"{name} must be a boolean (true/false)")
+
+
 def _parse_optional_str(value: str | None) -> str | None:
     if value is None:
         return None
@@ -32,6 +46,7 @@ def _parse_optional_str(value: str | None) -> str | None:
     return candidate or None
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     db_path = os.getenv("DB_PATH", "./data/licenses.db")
     token_ttl_seconds = _parse_int(os.getenv("TOKEN_TTL_SECONDS", "86400"), "TOKEN_TTL_SECONDS")
@@ -39,6 +54,7 @@ def get_settings() -> Settings:
     port = _parse_int(os.getenv("PORT", "8000"), "PORT")
     admin_username = _parse_optional_str(os.getenv("ADMIN_USERNAME"))
     admin_password = _parse_optional_str(os.getenv("ADMIN_PASSWORD"))
+    debug = _parse_bool(os.getenv("DEBUG", "false"), "DEBUG")
 
     if token_ttl_seconds < 1:
         raise ValueError("TOKEN_TTL_SECONDS must be >= 1")
@@ -56,4 +72,5 @@ def get_settings() -> Settings:
         port=port,
         admin_username=admin_username,
         admin_password=admin_password,
+        debug=debug,
     )
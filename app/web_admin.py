@@ -1,57 +1,182 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
+import gzip
+import hashlib
+import re
 import secrets
 import sqlite3
-from datetime import timedelta
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
-from urllib.parse import urlencode
+from typing import Any, TypeVar
+from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.security import HTTPBasic
 from fastapi.templating import Jinja2Templates
+from jinja2 import Template
+from starlette.datastructures import FormData
 
 from app.db import (
     disable_license,
-    enable_license,
+    enable_or_reactivate_license,
     get_license,
-    init_db,
-    list_licenses,
-    reactivate_license,
+    list_licenses_with_expiry,
     update_license_duration,
 )
-from app.license_admin import create_license, format_license, generate_unique_key
-from app.service import format_remaining_time, parse_rfc3339, split_remaining_time, to_rfc3339, utc_now
-from app.settings import get_settings
+from app.db_pool import POOL_SIZE, get_pool
+from app.license_admin import create_license, generate_unique_key
+from app.models import LicenseExpiryRecord
+from app.responses import ORJSONResponse, accepts_gzip
+from app.service import (
+    SHORTEST_MONTH_SECONDS,
+    format_remaining_time,
+    parse_rfc3339,
+    split_remaining_seconds,
+    split_remaining_time,
+    to_rfc3339,
+    utc_now,
+)
+from app.settings import Settings, get_settings
 
 BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 router = APIRouter(prefix="/admin", tags=["admin"])
-basic_auth = HTTPBasic()
 
 
-def _require_admin(credentials: HTTPBasicCredentials = Depends(basic_auth)) -> str:
-    settings = get_settings()
+class _AuthorizationHeader(HTTPBasic):
+    # Declares the Basic scheme in OpenAPI but hands over the raw header; _check_auth
+    # memoizes decoding and comparison per header value.
+    async def __call__(self, request: Request) -> str:  # type: ignore[override]
+        return request.headers.get("authorization", "")
+
+
+basic_auth = _AuthorizationHeader(scheme_name="HTTPBasic", auto_error=False)
+
+_T = TypeVar("_T")
+
+# Each job checks out exactly one connection and never nests checkouts, so admin workers
+# cannot deadlock each other. The pool is shared with /v1/token and the CLI, so a worker
+# may still wait for a connection while those hold them.
+_sqlite_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="admin-sqlite")
+
+_INDEX_TEMPLATE_NAME = "admin/index_shell.html"
+_SHELL_CACHE_SIZE = 16
+_SHELL_CACHE_CONTROL = "private, max-age=60"
+# Action outcomes are one-off; neither the browser nor a proxy may replay them.
+_ACTION_HEADERS = {"Cache-Control": "no-store"}
+_LICENSE_KEY_PLACEHOLDER = "__license_key__"
+_INT_RE = re.compile(r"[+-]?\d+")
+_KEY_GENERATED_MESSAGE = "License key generated."
+_KEY_GENERATED_QUERY = f"message={quote(_KEY_GENERATED_MESSAGE, safe='')}"
+_ADMIN_URL_NAMES = (
+    "admin_dashboard",
+    "admin_list_licenses",
+    "admin_create_license",
+    "admin_generate_key",
+)
+_LICENSE_ACTION_URL_NAMES = (
+    "admin_disable_license",
+    "admin_enable_license",
+    "admin_update_remaining_time",
+)
+
+
+@lru_cache(maxsize=1)
+def _expected_credentials(settings: Settings) -> tuple[bytes, bytes]:
+    return (settings.admin_username or "").encode(), (settings.admin_password or "").encode()
+
+
+@lru_cache(maxsize=256)
+def _check_auth(authorization: str, settings: Settings) -> str | None:
+    scheme, _, param = authorization.partition(" ")
+    if scheme.lower() != "basic":
+        return None
+
+    try:
+        decoded = base64.b64decode(param, validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
+    username, separator, password = decoded.partition(":")
+    if not separator:
+        return None
+
+    expected_username, expected_password = _expected_credentials(settings)
+    username_valid = secrets.compare_digest(username.encode(), expected_username)
+    password_valid = secrets.compare_digest(password.encode(), expected_password)
+    return username if username_valid and password_valid else None
+
+
+async def _get_settings() -> Settings:
+    # Async so FastAPI resolves it on the loop rather than through the threadpool.
+    return get_settings()
+
+
+async def _require_admin(
+    authorization: str = Depends(basic_auth),
+    settings: Settings = Depends(_get_settings),
+) -> str:
     if not settings.admin_enabled:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Admin panel is disabled. Set ADMIN_USERNAME and ADMIN_PASSWORD.",
         )
 
-    expected_username = settings.admin_username or ""
-    expected_password = settings.admin_password or ""
-    username_valid = secrets.compare_digest(credentials.username, expected_username)
-    password_valid = secrets.compare_digest(credentials.password, expected_password)
-
-    if not (username_valid and password_valid):
+    username = _check_auth(authorization, settings)
+    if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid admin credentials",
             headers={"WWW-Authenticate": "Basic"},
         )
 
-    return credentials.username
+    return username
+
+
+@lru_cache(maxsize=1)
+def _compiled_index_template() -> Template:
+    return templates.get_template(_INDEX_TEMPLATE_NAME)
+
+
+def _index_template(settings: Settings) -> Template:
+    # Outside debug mode keep the compiled template, skipping the loader's mtime checks.
+    if settings.debug:
+        return templates.get_template(_INDEX_TEMPLATE_NAME)
+    return _compiled_index_template()
+
+
+def _form_str(form: FormData, key: str) -> str:
+    value = form.get(key, "")
+    # Uploaded files are never valid admin input; treat them as missing.
+    if not isinstance(value, str):
+        return ""
+    return value.strip()
+
+
+def _parse_int(value: str) -> int | None:
+    if _INT_RE.fullmatch(value) is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        # Digit strings past the interpreter's int conversion limit.
+        return None
+
+
+async def _run_db(func: Callable[..., _T], db_path: str, *args: Any, **kwargs: Any) -> _T:
+    def run() -> _T:
+        with get_pool(db_path).connection() as conn:
+            return func(db_path, *args, conn=conn, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(_sqlite_executor, run)
 
 
 def _redirect_to_dashboard(
@@ -60,242 +185,367 @@ def _redirect_to_dashboard(
     message: str | None = None,
     error: str | None = None,
 ) -> RedirectResponse:
-    query = {}
-    if message:
-        query["message"] = message
+    redirect_url = _admin_url(request, "admin_dashboard")
+    if message and error:
+        redirect_url += f"?message={quote(message, safe='')}&error={quote(error, safe='')}"
+    elif message:
+        redirect_url += f"?message={quote(message, safe='')}"
+    elif error:
+        redirect_url += f"?error={quote(error, safe='')}"
+    return RedirectResponse(
+        url=redirect_url, status_code=status.HTTP_303_SEE_OTHER, headers=_ACTION_HEADERS
+    )
+
+
+def _wants_json(request: Request) -> bool:
+    return "application/json" in request.headers.get("accept", "")
+
+
+def _action_result(
+    request: Request,
+    *,
+    message: str | None = None,
+    error: str | None = None,
+    error_status: int = status.HTTP_400_BAD_REQUEST,
+) -> Response:
+    # Script-driven clients get the outcome inline instead of a redirect back to the shell.
+    if not _wants_json(request):
+        return _redirect_to_dashboard(request, message=message, error=error)
     if error:
-        query["error"] = error
+        return ORJSONResponse(
+            {"ok": False, "error": error}, status_code=error_status, headers=_ACTION_HEADERS
+        )
+    return ORJSONResponse({"ok": True, "message": message}, headers=_ACTION_HEADERS)
+
+
+def _admin_url_paths(request: Request) -> dict[str, str]:
+    url_paths: dict[str, str] | None = getattr(request.app.state, "admin_url_paths", None)
+    if url_paths is None:
+        app = request.app
+        url_paths = {name: str(app.url_path_for(name)) for name in _ADMIN_URL_NAMES}
+        url_paths.update(
+            {
+                name: str(app.url_path_for(name, license_key=_LICENSE_KEY_PLACEHOLDER))
+                for name in _LICENSE_ACTION_URL_NAMES
+            }
+        )
+        url_paths["admin_stylesheet"] = str(app.url_path_for("static", path="admin.css"))
+        app.state.admin_url_paths = url_paths
+    return url_paths
 
-    base_url = str(request.url_for("admin_dashboard"))
-    redirect_url = f"{base_url}?{urlencode(query)}" if query else base_url
-    return RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
 
+def _admin_url(request: Request, name: str, url_paths: dict[str, str] | None = None) -> str:
+    # Paths are cached per app; the origin still comes from each request, like url_for.
+    path = (url_paths or _admin_url_paths(request))[name]
+    return f"{str(request.base_url).rstrip('/')}{path}"
 
-def _build_license_rows(request: Request, db_path: str) -> list[dict[str, Any]]:
-    now = utc_now()
+
+def _build_license_rows(
+    request: Request,
+    now: datetime,
+    expiry_rows: list[LicenseExpiryRecord],
+) -> list[dict[str, Any]]:
+    url_paths = _admin_url_paths(request)
+    disable_template = _admin_url(request, "admin_disable_license", url_paths)
+    enable_template = _admin_url(request, "admin_enable_license", url_paths)
+    update_remaining_template = _admin_url(request, "admin_update_remaining_time", url_paths)
     rows = []
 
-    for record in list_licenses(db_path):
-        payload = format_license(record)
-        expires_at = parse_rfc3339(payload["license_expires_at"])
-        remaining_time = split_remaining_time(now, expires_at)
-        is_expired = now >= expires_at
+    for row in expiry_rows:
+        record = row.license
+        if row.seconds_remaining < SHORTEST_MONTH_SECONDS:
+            remaining_time = split_remaining_seconds(row.seconds_remaining)
+        else:
+            remaining_time = split_remaining_time(now, parse_rfc3339(row.license_expires_at))
+        is_expired = row.is_expired
         is_effectively_disabled = record.status == "disabled" or is_expired
-
-        payload["remaining_time"] = remaining_time
-        payload["remaining_time_label"] = format_remaining_time(remaining_time)
-        payload["is_expired"] = is_expired
-        payload["display_status"] = "disabled" if is_effectively_disabled else "active"
-        payload["action_mode"] = "enable" if is_effectively_disabled else "disable"
-        payload["requires_duration"] = is_expired
-        payload["disable_action"] = str(
-            request.url_for("admin_disable_license", license_key=record.license_key)
+        quoted_key = quote(record.license_key, safe="")
+
+        rows.append(
+            {
+                "license_key": record.license_key,
+                "issued_at": row.issued_at,
+                "duration_days": record.duration_days,
+                "license_expires_at": row.license_expires_at,
+                "status": record.status,
+                "note": record.note,
+                "remaining_time": remaining_time,
+                "remaining_time_label": format_remaining_time(remaining_time),
+                "is_expired": is_expired,
+                "display_status": "disabled" if is_effectively_disabled else "active",
+                "action_mode": "enable" if is_effectively_disabled else "disable",
+                "requires_duration": is_expired,
+                "disable_action": disable_template.replace(_LICENSE_KEY_PLACEHOLDER, quoted_key),
+                "enable_action": enable_template.replace(_LICENSE_KEY_PLACEHOLDER, quoted_key),
+                "update_remaining_action": update_remaining_template.replace(
+                    _LICENSE_KEY_PLACEHOLDER, quoted_key
+                ),
+            }
         )
-        payload["enable_action"] = str(
-            request.url_for("admin_enable_license", license_key=record.license_key)
-        )
-        payload["update_remaining_action"] = str(
-            request.url_for("admin_update_remaining_time", license_key=record.license_key)
-        )
-        rows.append(payload)
 
     return rows
 
 
-@router.get("", response_class=HTMLResponse, name="admin_dashboard")
-def dashboard(
-    request: Request,
-    _: str = Depends(_require_admin),
-    message: str | None = None,
-    error: str | None = None,
-    key: str | None = None,
-) -> HTMLResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-    rows = _build_license_rows(request, settings.db_path)
-
-    return templates.TemplateResponse(
-        request=request,
-        name="admin/index.html",
-        context={
-            "licenses": rows,
-            "message": message,
-            "error": error,
-            "generated_key": key or "",
-            "create_action": str(request.url_for("admin_create_license")),
-            "generate_key_action": str(request.url_for("admin_generate_key")),
+def _license_list_response(
+    db_path: str, request: Request, *, conn: sqlite3.Connection
+) -> ORJSONResponse:
+    # Built on the admin executor: row building and serialization are O(rows) on every poll.
+    now = utc_now()
+    expiry_rows = list_licenses_with_expiry(db_path, to_rfc3339(now), conn=conn)
+    rows = _build_license_rows(request, now, expiry_rows)
+    return ORJSONResponse({"licenses": rows, "total": len(rows)})
+
+
+@dataclass(frozen=True)
+class _DashboardShell:
+    body: bytes
+    etag: str
+    gzip_body: bytes
+    gzip_etag: str
+
+
+def _render_dashboard_shell(request: Request, settings: Settings) -> _DashboardShell:
+    url_paths = _admin_url_paths(request)
+    body = _index_template(settings).render(
+        {
+            "stylesheet_url": _admin_url(request, "admin_stylesheet", url_paths),
+            "licenses_endpoint": _admin_url(request, "admin_list_licenses", url_paths),
+            "create_action": _admin_url(request, "admin_create_license", url_paths),
+            "generate_key_action": _admin_url(request, "admin_generate_key", url_paths),
             "token_ttl_seconds": settings.token_ttl_seconds,
             "db_path": settings.db_path,
-        },
+        }
+    ).encode("utf-8")
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    # Compressed once per cached shell; mtime=0 keeps the gzip bytes deterministic.
+    return _DashboardShell(
+        body=body,
+        etag=f'"{digest}"',
+        gzip_body=gzip.compress(body, compresslevel=9, mtime=0),
+        gzip_etag=f'"{digest}-gzip"',
     )
 
 
-@router.get("/licenses", name="admin_list_licenses")
-def list_licenses_view(
+def _dashboard_shell(request: Request, settings: Settings) -> _DashboardShell:
+    if settings.debug:
+        return _render_dashboard_shell(request, settings)
+
+    cache: dict[tuple[str, Settings], _DashboardShell] | None = getattr(
+        request.app.state, "admin_shell_cache", None
+    )
+    if cache is None:
+        cache = {}
+        request.app.state.admin_shell_cache = cache
+
+    # The shell embeds absolute URLs, so it is cached per base URL (and settings).
+    cache_key = (str(request.base_url), settings)
+    shell = cache.get(cache_key)
+    if shell is None:
+        shell = _render_dashboard_shell(request, settings)
+        if len(cache) >= _SHELL_CACHE_SIZE:
+            cache.clear()
+        cache[cache_key] = shell
+    return shell
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@router.get("", response_class=HTMLResponse, name="admin_dashboard")
+async def dashboard(
+    request: Request,
+    _: str = Depends(_require_admin),
+    settings: Settings = Depends(_get_settings),
+) -> Response:
+    shell = _dashboard_shell(request, settings)
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = shell.gzip_etag if use_gzip else shell.etag
+    headers = {"ETag": etag, "Cache-Control": _SHELL_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(shell.gzip_body, headers=headers)
+    return HTMLResponse(shell.body, headers=headers)
+
+
+@router.get("/licenses", response_class=ORJSONResponse, name="admin_list_licenses")
+async def list_licenses_view(
     request: Request,
     _: str = Depends(_require_admin),
-) -> dict[str, Any]:
-    settings = get_settings()
-    init_db(settings.db_path)
-    rows = _build_license_rows(request, settings.db_path)
-    return {"licenses": rows, "total": len(rows)}
+    settings: Settings = Depends(_get_settings),
+) -> ORJSONResponse:
+    return await _run_db(_license_list_response, settings.db_path, request)
 
 
 @router.post("/licenses", name="admin_create_license")
 async def create_license_view(
     request: Request,
     _: str = Depends(_require_admin),
-) -> RedirectResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-
+    settings: Settings = Depends(_get_settings),
+) -> Response:
     form = await request.form()
 
-    days_raw = str(form.get("days", "")).strip()
-    key_raw = str(form.get("key", "")).strip()
-    note_raw = str(form.get("note", "")).strip()
+    days = _parse_int(_form_str(form, "days"))
+    key_raw = _form_str(form, "key")
+    note_raw = _form_str(form, "note")
 
-    try:
-        days = int(days_raw)
-    except ValueError:
-        return _redirect_to_dashboard(request, error="Days must be an integer.")
+    if days is None:
+        return _action_result(request, error="Days must be an integer.")
 
     key = key_raw or None
     note = note_raw or None
 
     try:
-        record = create_license(
+        record = await _run_db(
+            create_license,
             settings.db_path,
             days=days,
             key=key,
             note=note,
         )
     except ValueError as exc:
-        return _redirect_to_dashboard(request, error=str(exc))
+        return _action_result(request, error=str(exc))
     except sqlite3.IntegrityError:
-        return _redirect_to_dashboard(request, error=f"License key already exists: {key}")
+        return _action_result(
+            request,
+            error=f"License key already exists: {key}",
+            error_status=status.HTTP_409_CONFLICT,
+        )
     except RuntimeError as exc:
-        return _redirect_to_dashboard(request, error=str(exc))
+        return _action_result(
+            request,
+            error=str(exc),
+            error_status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-    return _redirect_to_dashboard(request, message=f"License created: {record.license_key}")
+    return _action_result(request, message=f"License created: {record.license_key}")
 
 
 @router.post("/licenses/{license_key}/disable", name="admin_disable_license")
-def disable_license_view(
+async def disable_license_view(
     request: Request,
     license_key: str,
     _: str = Depends(_require_admin),
-) -> RedirectResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-
-    if not disable_license(settings.db_path, license_key):
-        return _redirect_to_dashboard(request, error=f"License key not found: {license_key}")
+    settings: Settings = Depends(_get_settings),
+) -> Response:
+    if not await _run_db(disable_license, settings.db_path, license_key):
+        return _action_result(
+            request,
+            error=f"License key not found: {license_key}",
+            error_status=status.HTTP_404_NOT_FOUND,
+        )
 
-    return _redirect_to_dashboard(request, message=f"License disabled: {license_key}")
+    return _action_result(request, message=f"License disabled: {license_key}")
 
 
 @router.post("/licenses/{license_key}/enable", name="admin_enable_license")
-def enable_license_view(
+async def enable_license_view(
     request: Request,
     license_key: str,
     days: str | None = Form(default=None),
     _: str = Depends(_require_admin),
-) -> RedirectResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-
-    record = get_license(settings.db_path, license_key)
-    if record is None:
-        return _redirect_to_dashboard(request, error=f"License key not found: {license_key}")
+    settings: Settings = Depends(_get_settings),
+) -> Response:
+    days_raw = (days or "").strip()
+    duration_days = _parse_int(days_raw) if days_raw else None
+    requested_days = duration_days if duration_days is not None and duration_days >= 1 else None
+    result = await _run_db(
+        enable_or_reactivate_license,
+        settings.db_path,
+        license_key,
+        now_rfc3339=to_rfc3339(utc_now()),
+        duration_days=requested_days,
+    )
+    if result is None:
+        return _action_result(
+            request,
+            error=f"License key not found: {license_key}",
+            error_status=status.HTTP_404_NOT_FOUND,
+        )
 
-    now = utc_now()
-    issued_at = parse_rfc3339(record.issued_at)
-    is_expired = now >= issued_at + timedelta(days=record.duration_days)
+    outcome, row = result
+    if outcome == "reactivated":
+        return _action_result(
+            request,
+            message=f"License reactivated for {row.license.duration_days} day(s): {license_key}",
+        )
 
-    if is_expired:
-        days_raw = (days or "").strip()
+    if row.is_expired:
         if not days_raw:
-            return _redirect_to_dashboard(
+            return _action_result(
                 request,
                 error=f"License is expired. Select a duration (days) before enabling: {license_key}",
             )
+        if duration_days is None:
+            return _action_result(request, error="Days must be an integer.")
+        return _action_result(request, error="Days must be >= 1.")
 
-        try:
-            duration_days = int(days_raw)
-        except ValueError:
-            return _redirect_to_dashboard(request, error="Days must be an integer.")
-
-        if duration_days < 1:
-            return _redirect_to_dashboard(request, error="Days must be >= 1.")
-
-        if not reactivate_license(
-            settings.db_path,
-            license_key,
-            issued_at=to_rfc3339(now),
-            duration_days=duration_days,
-        ):
-            return _redirect_to_dashboard(request, error=f"License key not found: {license_key}")
-
-        return _redirect_to_dashboard(
-            request,
-            message=f"License reactivated for {duration_days} day(s): {license_key}",
-        )
-
-    if not enable_license(settings.db_path, license_key):
-        return _redirect_to_dashboard(request, error=f"License key not found: {license_key}")
-
-    return _redirect_to_dashboard(request, message=f"License enabled: {license_key}")
+    return _action_result(request, message=f"License enabled: {license_key}")
 
 
 @router.post("/licenses/{license_key}/remaining-time", name="admin_update_remaining_time")
-def update_remaining_time_view(
+async def update_remaining_time_view(
     license_key: str,
     days: str | None = Form(default=None),
     _: str = Depends(_require_admin),
-) -> JSONResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-
-    if get_license(settings.db_path, license_key) is None:
-        return JSONResponse(
+    settings: Settings = Depends(_get_settings),
+) -> ORJSONResponse:
+    if await _run_db(get_license, settings.db_path, license_key) is None:
+        return ORJSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
+            headers=_ACTION_HEADERS,
             content={"ok": False, "error": f"License key not found: {license_key}"},
         )
 
     days_raw = (days or "").strip()
     if not days_raw:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
+            headers=_ACTION_HEADERS,
             content={"ok": False, "error": "Days is required."},
         )
 
-    try:
-        duration_days = int(days_raw)
-    except ValueError:
-        return JSONResponse(
+    duration_days = _parse_int(days_raw)
+    if duration_days is None:
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
+            headers=_ACTION_HEADERS,
             content={"ok": False, "error": "Days must be an integer."},
         )
 
     if duration_days < 1:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
+            headers=_ACTION_HEADERS,
             content={"ok": False, "error": "Days must be >= 1."},
         )
 
-    if not update_license_duration(
+    if not await _run_db(
+        update_license_duration,
         settings.db_path,
         license_key,
         issued_at=to_rfc3339(utc_now()),
         duration_days=duration_days,
     ):
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
+            headers=_ACTION_HEADERS,
             content={"ok": False, "error": f"License key not found: {license_key}"},
         )
 
-    return JSONResponse(
+    return ORJSONResponse(
+        headers=_ACTION_HEADERS,
         content={
             "ok": True,
             "message": f"Remaining time updated to {duration_days} day(s): {license_key}",
@@ -304,17 +554,22 @@ def update_remaining_time_view(
 
 
 @router.post("/licenses/generate-key", name="admin_generate_key")
-def generate_key_view(
+async def generate_key_view(
     request: Request,
     _: str = Depends(_require_admin),
-) -> RedirectResponse:
-    settings = get_settings()
-    init_db(settings.db_path)
-    key = generate_unique_key(settings.db_path)
+    settings: Settings = Depends(_get_settings),
+) -> Response:
+    key = await _run_db(generate_unique_key, settings.db_path)
+    if _wants_json(request):
+        return ORJSONResponse(
+            {"ok": True, "message": _KEY_GENERATED_MESSAGE, "key": key}, headers=_ACTION_HEADERS
+        )
     return _redirect_to_dashboard_with_key(request, key)
 
 
 def _redirect_to_dashboard_with_key(request: Request, key: str) -> RedirectResponse:
-    base_url = str(request.url_for("admin_dashboard"))
-    query = urlencode({"key": key, "message": "License key generated."})
-    return RedirectResponse(url=f"{base_url}?{query}", status_code=status.HTTP_303_SEE_OTHER)
+    base_url = _admin_url(request, "admin_dashboard")
+    redirect_url = f"{base_url}?key={quote(key, safe='')}&{_KEY_GENERATED_QUERY}"
+    return RedirectResponse(
+        url=redirect_url, status_code=status.HTTP_303_SEE_OTHER, headers=_ACTION_HEADERS
+    )
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+
+from app.db_pool import close_pools
+
+
+@pytest.fixture(autouse=True)
+def _close_connection_pools() -> Iterator[None]:
+    yield
+    close_pools()
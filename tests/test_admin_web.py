@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 from fastapi.testclient import TestClient
 
-from app.db import get_license, init_db, insert_license, list_licenses
+from app.db import get_license, init_db, insert_license, insert_licenses, list_licenses
 from app.models import LicenseRecord
 from app.service import parse_rfc3339, to_rfc3339, utc_now
+from app.settings import get_settings
 
 
 @pytest.fixture()
@@ -17,6 +19,7 @@ def db_path(tmp_path, monkeypatch) -> str:
     monkeypatch.setenv("TOKEN_TTL_SECONDS", "86400")
     monkeypatch.setenv("ADMIN_USERNAME", "admin")
     monkeypatch.setenv("ADMIN_PASSWORD", "secret-pass")
+    get_settings.cache_clear()
     init_db(str(path))
     return str(path)
 
@@ -34,6 +37,28 @@ def test_admin_dashboard_requires_auth(client: TestClient) -> None:
     assert response.status_code == 401
 
 
+def test_admin_dashboard_rejects_invalid_credentials(client: TestClient) -> None:
+    for _ in range(2):
+        response = client.get("/admin", auth=("admin", "wrong-pass"), follow_redirects=False)
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Basic"
+
+    malformed = client.get("/admin", headers={"Authorization": "Basic not-base64!"})
+    assert malformed.status_code == 401
+
+    assert client.get("/admin", auth=("admin", "secret-pass")).status_code == 200
+
+
+def test_admin_routes_declare_basic_auth_in_openapi(client: TestClient) -> None:
+    schema = client.get("/openapi.json").json()
+    assert schema["components"]["securitySchemes"]["HTTPBasic"] == {
+        "type": "http",
+        "scheme": "basic",
+    }
+    assert schema["paths"]["/admin"]["get"]["security"] == [{"HTTPBasic": []}]
+    assert "security" not in schema["paths"]["/v1/token"]["post"]
+
+
 def test_admin_dashboard_lists_licenses(client: TestClient, db_path: str) -> None:
     record = LicenseRecord(
         license_key="ABCD-EFGH-JKLM",
@@ -47,8 +72,65 @@ def test_admin_dashboard_lists_licenses(client: TestClient, db_path: str) -> Non
     response = client.get("/admin", auth=("admin", "secret-pass"))
     assert response.status_code == 200
     assert "CCM License Admin" in response.text
-    assert "ABCD-EFGH-JKLM" in response.text
-    assert "demo" in response.text
+    assert '"http://testserver/admin/licenses"' in response.text
+
+    licenses = client.get("/admin/licenses", auth=("admin", "secret-pass")).json()
+    assert licenses["total"] == 1
+    assert licenses["licenses"][0]["license_key"] == "ABCD-EFGH-JKLM"
+    assert licenses["licenses"][0]["note"] == "demo"
+
+
+def test_admin_reads_resolve_dependencies_on_the_loop(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import fastapi.dependencies.utils as dependency_utils
+
+    offloaded: list[str] = []
+    run_in_threadpool = dependency_utils.run_in_threadpool
+
+    async def record_run_in_threadpool(func, *args, **kwargs):
+        offloaded.append(func.__name__)
+        return await run_in_threadpool(func, *args, **kwargs)
+
+    monkeypatch.setattr(dependency_utils, "run_in_threadpool", record_run_in_threadpool)
+
+    assert client.get("/admin", auth=("admin", "secret-pass")).status_code == 200
+    assert client.get("/admin/licenses", auth=("admin", "secret-pass")).status_code == 200
+    assert offloaded == []
+
+
+def test_admin_dashboard_shell_honors_etag(client: TestClient, db_path: str) -> None:
+    first = client.get("/admin", auth=("admin", "secret-pass"))
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, max-age=60"
+
+    insert_license(
+        db_path,
+        LicenseRecord(
+            license_key="ETAG-TEST-0001",
+            issued_at=to_rfc3339(utc_now()),
+            duration_days=30,
+            status="active",
+        ),
+    )
+
+    cached = client.get(
+        "/admin?message=hello",
+        auth=("admin", "secret-pass"),
+        headers={"If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    stale = client.get(
+        "/admin",
+        auth=("admin", "secret-pass"),
+        headers={"If-None-Match": '"stale"'},
+    )
+    assert stale.status_code == 200
+    assert stale.content == first.content
 
 
 def test_admin_create_disable_and_enable_license(client: TestClient, db_path: str) -> None:
@@ -89,6 +171,59 @@ def test_admin_create_disable_and_enable_license(client: TestClient, db_path: st
     assert reenabled.status == "active"
 
 
+def test_admin_dashboard_shell_serves_precompressed_gzip(
+    client: TestClient, db_path: str
+) -> None:
+    compressed = client.get(
+        "/admin", auth=("admin", "secret-pass"), headers={"Accept-Encoding": "gzip"}
+    )
+    identity = client.get(
+        "/admin", auth=("admin", "secret-pass"), headers={"Accept-Encoding": "identity"}
+    )
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in identity.headers
+    assert compressed.content == identity.content
+    assert compressed.headers["etag"] != identity.headers["etag"]
+
+    for refused in ("gzip;q=0, identity", "gzip; q=0.0", "gzip;q=0, *", "*;q=0", "br"):
+        response = client.get(
+            "/admin", auth=("admin", "secret-pass"), headers={"Accept-Encoding": refused}
+        )
+        assert "content-encoding" not in response.headers, refused
+    wildcard = client.get(
+        "/admin", auth=("admin", "secret-pass"), headers={"Accept-Encoding": "br;q=1, *;q=0.5"}
+    )
+    assert wildcard.headers["content-encoding"] == "gzip"
+
+    insert_licenses(
+        db_path,
+        [
+            LicenseRecord(
+                license_key=f"GZIP-TEST-000{index}",
+                issued_at=to_rfc3339(utc_now()),
+                duration_days=30,
+                status="active",
+            )
+            for index in range(5)
+        ],
+    )
+    licenses = client.get(
+        "/admin/licenses", auth=("admin", "secret-pass"), headers={"Accept-Encoding": "gzip"}
+    )
+    assert licenses.headers["content-encoding"] == "gzip"
+    assert licenses.json()["total"] == 5
+
+    refused = client.get(
+        "/admin/licenses",
+        auth=("admin", "secret-pass"),
+        headers={"Accept-Encoding": "gzip;q=0, identity"},
+    )
+    assert "content-encoding" not in refused.headers
+    assert refused.json()["total"] == 5
+
+
 def test_admin_generate_key_prefills_form(client: TestClient) -> None:
     response = client.post(
         "/admin/licenses/generate-key",
@@ -104,6 +239,167 @@ def test_admin_generate_key_prefills_form(client: TestClient) -> None:
     assert 'name="key"' in dashboard.text
 
 
+def test_admin_redirect_query_round_trips_messages(client: TestClient) -> None:
+    response = client.post(
+        "/admin/licenses",
+        data={"days": "abc", "key": "", "note": ""},
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    location = urlsplit(response.headers["location"])
+    assert location.path == "/admin"
+    assert parse_qs(location.query) == {"error": ["Days must be an integer."]}
+
+    response = client.post(
+        "/admin/licenses",
+        data={"key": "", "note": ""},
+        files={"days": ("days.txt", b"30", "text/plain")},
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert parse_qs(urlsplit(response.headers["location"]).query) == {
+        "error": ["Days must be an integer."]
+    }
+
+    response = client.post(
+        "/admin/licenses/generate-key",
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    query = parse_qs(urlsplit(response.headers["location"]).query)
+    assert query["message"] == ["License key generated."]
+    assert len(query["key"][0]) == 14
+
+
+def test_admin_actions_answer_json_clients_inline(client: TestClient, db_path: str) -> None:
+    headers = {"Accept": "application/json"}
+
+    created = client.post(
+        "/admin/licenses",
+        data={"days": "30", "key": "JSON-TEST-0001", "note": ""},
+        headers=headers,
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert created.status_code == 200
+    assert created.json() == {"ok": True, "message": "License created: JSON-TEST-0001"}
+
+    duplicate = client.post(
+        "/admin/licenses",
+        data={"days": "30", "key": "JSON-TEST-0001", "note": ""},
+        headers=headers,
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert duplicate.status_code == 409
+    assert duplicate.json() == {"ok": False, "error": "License key already exists: JSON-TEST-0001"}
+
+    disabled = client.post(
+        "/admin/licenses/JSON-TEST-0001/disable",
+        headers=headers,
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert disabled.status_code == 200
+    assert disabled.json()["ok"] is True
+    record = get_license(db_path, "JSON-TEST-0001")
+    assert record is not None
+    assert record.status == "disabled"
+
+    missing = client.post(
+        "/admin/licenses/MISS-ING1-KEY2/enable",
+        headers=headers,
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert missing.status_code == 404
+    assert missing.json() == {"ok": False, "error": "License key not found: MISS-ING1-KEY2"}
+
+    generated = client.post(
+        "/admin/licenses/generate-key",
+        headers=headers,
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert generated.status_code == 200
+    assert generated.json()["message"] == "License key generated."
+    assert len(generated.json()["key"]) == 14
+
+    redirected = client.post(
+        "/admin/licenses/JSON-TEST-0001/enable",
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert redirected.status_code == 303
+
+    for response in (created, duplicate, disabled, missing, generated, redirected):
+        assert response.headers["cache-control"] == "no-store"
+
+
+def test_admin_enable_reports_enabled_for_fresh_disabled_license(client: TestClient) -> None:
+    headers = {"Accept": "application/json"}
+    auth = ("admin", "secret-pass")
+    client.post(
+        "/admin/licenses",
+        data={"days": "10", "key": "FRSH-TEST-0001", "note": ""},
+        headers=headers,
+        auth=auth,
+    )
+    client.post("/admin/licenses/FRSH-TEST-0001/disable", headers=headers, auth=auth)
+
+    enabled = client.post(
+        "/admin/licenses/FRSH-TEST-0001/enable",
+        data={"days": "10"},
+        headers=headers,
+        auth=auth,
+    )
+    assert enabled.json() == {"ok": True, "message": "License enabled: FRSH-TEST-0001"}
+
+
+def test_admin_rejects_oversized_day_counts(client: TestClient, db_path: str) -> None:
+    oversized = "9" * 5000
+
+    created = client.post(
+        "/admin/licenses",
+        data={"days": oversized, "key": "", "note": ""},
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert created.status_code == 303
+    assert parse_qs(urlsplit(created.headers["location"]).query) == {
+        "error": ["Days must be an integer."]
+    }
+
+    insert_license(
+        db_path,
+        LicenseRecord(
+            license_key="HUGE-DAYS-0001",
+            issued_at=to_rfc3339(utc_now()),
+            duration_days=30,
+            status="disabled",
+        ),
+    )
+    updated = client.post(
+        "/admin/licenses/HUGE-DAYS-0001/remaining-time",
+        data={"days": oversized},
+        auth=("admin", "secret-pass"),
+    )
+    assert updated.status_code == 400
+    assert updated.json() == {"ok": False, "error": "Days must be an integer."}
+
+    enabled = client.post(
+        "/admin/licenses/HUGE-DAYS-0001/enable",
+        data={"days": oversized},
+        auth=("admin", "secret-pass"),
+        follow_redirects=False,
+    )
+    assert enabled.status_code == 303
+    assert parse_qs(urlsplit(enabled.headers["location"]).query) == {
+        "message": ["License enabled: HUGE-DAYS-0001"]
+    }
+
+
 def test_admin_licenses_endpoint_marks_expired_as_enable_action(
     client: TestClient, db_path: str
 ) -> None:
@@ -147,11 +443,19 @@ def test_admin_dashboard_renders_remaining_time_editor_trigger(
 
     response = client.get("/admin", auth=("admin", "secret-pass"))
     assert response.status_code == 200
-    assert "remaining-time-trigger is-expired" in response.text
-    assert f'data-update-action="http://testserver/admin/licenses/EXPD-TEST-0003/remaining-time"' in response.text
-    assert 'data-requires-duration="1"' in response.text
+    assert "remaining-time-trigger" in response.text
+    assert 'trigger.classList.add("is-expired")' in response.text
+    assert "form.dataset.requiresDuration" in response.text
     assert "duration-picker" not in response.text
 
+    payload = client.get("/admin/licenses", auth=("admin", "secret-pass")).json()
+    item = next(row for row in payload["licenses"] if row["license_key"] == "EXPD-TEST-0003")
+    assert item["is_expired"] is True
+    assert item["requires_duration"] is True
+    assert item["update_remaining_action"] == (
+        "http://testserver/admin/licenses/EXPD-TEST-0003/remaining-time"
+    )
+
 
 def test_admin_update_remaining_time_then_enable_expired_license(
     client: TestClient, db_path: str
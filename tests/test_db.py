@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from app import license_admin
+from app.db import (
+    disable_license,
+    enable_license,
+    enable_or_reactivate_license,
+    existing_license_keys,
+    get_license,
+    init_db,
+    insert_license,
+    insert_licenses,
+    list_licenses,
+    list_licenses_with_expiry,
+)
+from app.db_pool import ConnectionPool, close_pools, get_pool, transaction
+from app.models import LicenseRecord
+
+
+def test_init_db_enables_wal_and_connection_pragmas(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+
+    with get_pool(db_path).connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -64000
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 30000
+
+
+def test_init_db_runs_schema_setup_once_per_path(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+
+    index_count_sql = "SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_licenses_issued_at_key'"
+    with get_pool(db_path).connection() as conn:
+        with conn:
+            conn.execute("DROP INDEX idx_licenses_issued_at_key")
+
+        init_db(db_path)
+        assert conn.execute(index_count_sql).fetchone()[0] == 0
+
+        init_db(db_path, conn=conn)
+        assert conn.execute(index_count_sql).fetchone()[0] == 1
+
+
+def test_insert_license_conflict_modes(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    record = LicenseRecord(
+        license_key="ABCD-EFGH-JKLM",
+        issued_at="2026-02-01T00:00:00Z",
+        duration_days=30,
+        status="active",
+        note="first",
+    )
+    assert insert_license(db_path, record) is True
+
+    duplicate = LicenseRecord(
+        license_key="ABCD-EFGH-JKLM",
+        issued_at="2026-02-02T00:00:00Z",
+        duration_days=5,
+        status="active",
+        note="second",
+    )
+    assert insert_license(db_path, duplicate, on_conflict="ignore") is False
+    with pytest.raises(sqlite3.IntegrityError):
+        insert_license(db_path, duplicate)
+
+    assert get_license(db_path, "ABCD-EFGH-JKLM") == record
+
+    invalid = LicenseRecord(
+        license_key="ZERO-DAYS-0001",
+        issued_at="2026-02-02T00:00:00Z",
+        duration_days=0,
+        status="active",
+    )
+    with pytest.raises(sqlite3.IntegrityError):
+        insert_license(db_path, invalid, on_conflict="ignore")
+
+
+def test_insert_licenses_is_all_or_nothing(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    records = [
+        LicenseRecord(
+            license_key=f"BULK-0000-000{index}",
+            issued_at="2026-02-01T00:00:00Z",
+            duration_days=30,
+            status="active",
+        )
+        for index in range(3)
+    ]
+
+    assert insert_licenses(db_path, records) == 3
+    assert insert_licenses(db_path, []) == 0
+
+    fresh = LicenseRecord(
+        license_key="BULK-0000-0009",
+        issued_at="2026-02-01T00:00:00Z",
+        duration_days=30,
+        status="active",
+    )
+    with pytest.raises(sqlite3.IntegrityError):
+        insert_licenses(db_path, [fresh, records[0]])
+
+    assert [record.license_key for record in list_licenses(db_path)] == [
+        "BULK-0000-0000",
+        "BULK-0000-0001",
+        "BULK-0000-0002",
+    ]
+
+
+def test_status_updates_skip_noop_writes(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    insert_license(
+        db_path,
+        LicenseRecord(
+            license_key="ABCD-EFGH-JKLM",
+            issued_at="2026-02-01T00:00:00Z",
+            duration_days=30,
+            status="active",
+        ),
+    )
+    with get_pool(db_path).connection() as conn:
+        changes_before = conn.total_changes
+
+        assert enable_license(db_path, "ABCD-EFGH-JKLM", conn=conn) is True
+        assert conn.total_changes == changes_before
+
+        assert disable_license(db_path, "ABCD-EFGH-JKLM", conn=conn) is True
+        assert conn.total_changes == changes_before + 1
+
+    assert get_license(db_path, "ABCD-EFGH-JKLM").status == "disabled"
+    assert disable_license(db_path, "MISS-ING1-KEY2") is False
+    assert enable_license(db_path, "MISS-ING1-KEY2") is False
+
+
+def test_list_licenses_with_expiry_computes_expiry_in_sql(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    insert_licenses(
+        db_path,
+        [
+            LicenseRecord(
+                license_key="ACTV-KEY1-AAAA",
+                issued_at="2026-02-01T03:00:00+03:00",
+                duration_days=30,
+                status="active",
+            ),
+            LicenseRecord(
+                license_key="EXPD-KEY1-AAAA",
+                issued_at="2026-01-01T00:00:00Z",
+                duration_days=1,
+                status="disabled",
+            ),
+        ],
+    )
+
+    rows = list_licenses_with_expiry(db_path, "2026-02-15T00:00:00Z")
+
+    assert [row.license.license_key for row in rows] == ["ACTV-KEY1-AAAA", "EXPD-KEY1-AAAA"]
+    assert rows[0].issued_at == "2026-02-01T00:00:00Z"
+    assert rows[0].license_expires_at == "2026-03-03T00:00:00Z"
+    assert rows[0].seconds_remaining == 16 * 86400
+    assert rows[0].is_expired is False
+    assert rows[1].license_expires_at == "2026-01-02T00:00:00Z"
+    assert rows[1].seconds_remaining == -44 * 86400
+    assert rows[1].is_expired is True
+
+
+def test_connection_pool_reuses_released_connections(tmp_path) -> None:
+    pool = ConnectionPool(str(tmp_path / "licenses.db"), size=2)
+
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert first is not second
+
+    with pool.connection() as reused:
+        assert reused is first or reused is second
+    pool.close()
+
+
+def test_close_pools_releases_connections_and_wal_files(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    pool = get_pool(db_path)
+
+    with pool.connection() as held:
+        with pool.connection() as idle:
+            pass
+        close_pools()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            idle.execute("SELECT 1")
+        held.execute("SELECT 1")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        held.execute("SELECT 1")
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+    assert not (tmp_path / "licenses.db-wal").exists()
+    assert not (tmp_path / "licenses.db-shm").exists()
+    assert get_pool(db_path) is not pool
+
+
+def test_checkout_refuses_idle_connection_handed_over_during_close(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    close_pools()
+    pool = ConnectionPool(db_path, size=1)
+    with pool.connection() as conn:
+        pass
+
+    get_nowait = pool._idle.get_nowait
+    handed_over: list[sqlite3.Connection] = []
+
+    def get_then_close():
+        if handed_over:
+            return get_nowait()
+        handed_over.append(get_nowait())
+        pool.close()
+        return handed_over[0]
+
+    monkeypatch.setattr(pool._idle, "get_nowait", get_then_close)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+    assert handed_over == [conn]
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert not (tmp_path / "licenses.db-wal").exists()
+
+
+def test_pool_connections_autocommit_and_lock_while_checked_out(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    pool = ConnectionPool(db_path, size=1)
+
+    with pool.connection() as conn:
+        assert conn.isolation_level is None
+        assert conn.lock.locked()
+
+        with pytest.raises(RuntimeError):
+            with transaction(conn):
+                conn.execute(
+                    "INSERT INTO licenses VALUES (?, ?, ?, ?, ?)",
+                    ("TXN-0000-0001", "2026-02-01T00:00:00Z", 30, "active", None),
+                )
+                assert conn.in_transaction
+                raise RuntimeError("abort")
+
+        assert not conn.in_transaction
+        assert get_license(db_path, "TXN-0000-0001", conn=conn) is None
+
+    assert not conn.lock.locked()
+    pool.close()
+
+
+def test_existing_license_keys_and_batched_key_generation(tmp_path, monkeypatch) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    insert_licenses(
+        db_path,
+        (
+            LicenseRecord(
+                license_key=key,
+                issued_at="2026-02-01T00:00:00Z",
+                duration_days=30,
+                status="active",
+            )
+            for key in ("TAKN-0000-0001", "TAKN-0000-0002")
+        ),
+    )
+
+    assert existing_license_keys(db_path, []) == set()
+    assert existing_license_keys(db_path, ["TAKN-0000-0001", "FREE-0000-0001"]) == {
+        "TAKN-0000-0001"
+    }
+
+    candidates = iter(["TAKN-0000-0001", "TAKN-0000-0002", "FREE-0000-0001"] * 6)
+    monkeypatch.setattr(license_admin, "generate_key", lambda: next(candidates))
+    assert license_admin.generate_unique_key(db_path) == "FREE-0000-0001"
+
+
+def test_enable_or_reactivate_license_reports_outcome(tmp_path) -> None:
+    db_path = str(tmp_path / "licenses.db")
+    init_db(db_path)
+    insert_licenses(
+        db_path,
+        [
+            LicenseRecord(
+                license_key="ACTV-0000-0001",
+                issued_at="2026-02-01T00:00:00Z",
+                duration_days=30,
+                status="active",
+            ),
+            LicenseRecord(
+                license_key="DSBL-0000-0001",
+                issued_at="2026-02-01T00:00:00Z",
+                duration_days=30,
+                status="disabled",
+            ),
+            LicenseRecord(
+                license_key="EXPD-0000-0001",
+                issued_at="2026-01-01T00:00:00Z",
+                duration_days=1,
+                status="disabled",
+            ),
+        ],
+    )
+    now = "2026-02-15T00:00:00Z"
+
+    missing = enable_or_reactivate_license(
+        db_path, "MISS-ING1-KEY2", now_rfc3339=now, duration_days=5
+    )
+    assert missing is None
+
+    result = enable_or_reactivate_license(
+        db_path, "DSBL-0000-0001", now_rfc3339=now, duration_days=5
+    )
+    assert result is not None
+    outcome, enabled = result
+    assert outcome == "enabled"
+    assert enabled.license.status == "active"
+    assert enabled.license.issued_at == "2026-02-01T00:00:00Z"
+    assert enabled.license.duration_days == 30
+
+    disable_license(db_path, "DSBL-0000-0001")
+    with get_pool(db_path).connection() as conn:
+        statements: list[str] = []
+        conn.set_trace_callback(statements.append)
+        try:
+            result = enable_or_reactivate_license(
+                db_path, "DSBL-0000-0001", now_rfc3339=now, duration_days=None, conn=conn
+            )
+        finally:
+            conn.set_trace_callback(None)
+    assert result is not None and result[0] == "enabled"
+    # BEGIN IMMEDIATE, the enable UPDATE and COMMIT; no reactivate attempt without days.
+    assert len(statements) == 3
+    assert sum("UPDATE" in statement for statement in statements) == 1
+
+    with get_pool(db_path).connection() as conn:
+        before = conn.total_changes
+        active = enable_or_reactivate_license(
+            db_path, "ACTV-0000-0001", now_rfc3339=now, duration_days=None, conn=conn
+        )
+        blocked = enable_or_reactivate_license(
+            db_path, "EXPD-0000-0001", now_rfc3339=now, duration_days=None, conn=conn
+        )
+        assert conn.total_changes == before
+    assert active is not None and active[0] == "unchanged"
+    assert active[1].is_expired is False
+    assert blocked is not None and blocked[0] == "unchanged"
+    assert blocked[1].is_expired is True
+    assert blocked[1].license.status == "disabled"
+
+    result = enable_or_reactivate_license(
+        db_path, "EXPD-0000-0001", now_rfc3339=now, duration_days=7
+    )
+    assert result is not None
+    outcome, reactivated = result
+    assert outcome == "reactivated"
+    assert reactivated.license.status == "active"
+    assert reactivated.license.issued_at == now
+    assert reactivated.license.duration_days == 7
+    assert reactivated.seconds_remaining == 7 * 86400
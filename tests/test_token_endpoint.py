@@ -1,13 +1,15 @@
 ﻿from __future__ import annotations
 
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
 import pytest
 from fastapi.testclient import TestClient
 
 from app.db import init_db, insert_license
-from app.models import LicenseRecord
+from app.models import LicenseRecord, TokenAllowedResponse, TokenDeniedResponse
 from app.service import format_remaining_time, parse_rfc3339, split_remaining_time, to_rfc3339, utc_now
+from app.settings import get_settings
 
 
 @pytest.fixture()
@@ -15,6 +17,7 @@ def db_path(tmp_path, monkeypatch) -> str:
     path = tmp_path / "licenses.db"
     monkeypatch.setenv("DB_PATH", str(path))
     monkeypatch.setenv("TOKEN_TTL_SECONDS", "86400")
+    get_settings.cache_clear()
     init_db(str(path))
     return str(path)
 
@@ -66,6 +69,7 @@ def test_token_allows_active_license(client: TestClient, db_path: str) -> None:
 
     assert response.status_code == 200
     payload = response.json()
+    TokenAllowedResponse.model_validate(payload)
     assert payload["allowed"] is True
     assert payload["token_ttl_seconds"] == 86400
     assert payload["license"]["license_key"] == "ABCD-EFGH-JKLM"
@@ -85,6 +89,10 @@ def test_token_allows_active_license(client: TestClient, db_path: str) -> None:
     )
     assert payload["server_time"].endswith("Z")
 
+    lease_id = payload["lease"]["lease_id"]
+    assert str(UUID(lease_id)) == lease_id
+    assert UUID(lease_id).version == 4
+
     lease_issued_at = parse_rfc3339(payload["lease"]["issued_at"])
     lease_expires_at = parse_rfc3339(payload["lease"]["expires_at"])
     assert int((lease_expires_at - lease_issued_at).total_seconds()) == 86400
@@ -103,6 +111,7 @@ def test_token_denies_disabled_license(client: TestClient, db_path: str) -> None
 
     assert response.status_code == 200
     payload = response.json()
+    TokenDeniedResponse.model_validate(payload)
     assert payload == {
         "allowed": False,
         "reason": "disabled",
@@ -171,6 +180,55 @@ def test_remaining_time_components_and_min_zero(client: TestClient, db_path: str
     )
 
 
+def test_split_remaining_time_counts_calendar_months_from_start() -> None:
+    now = datetime(2026, 1, 31, 10, 0, 0, tzinfo=timezone.utc)
+
+    assert split_remaining_time(now, datetime(2027, 3, 31, 12, 30, 5, tzinfo=timezone.utc)) == {
+        "years": 1,
+        "months": 2,
+        "days": 0,
+        "hours": 2,
+        "minutes": 30,
+        "seconds": 5,
+    }
+    assert split_remaining_time(now, datetime(2026, 2, 28, 9, 0, 0, tzinfo=timezone.utc)) == {
+        "years": 0,
+        "months": 0,
+        "days": 27,
+        "hours": 23,
+        "minutes": 0,
+        "seconds": 0,
+    }
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2026-02-01T00:00:00Z",
+        "2024-02-29T23:59:59Z",
+        "1999-12-31T12:34:56Z",
+    ],
+)
+def test_parse_rfc3339_fast_path_matches_generic_parse(value: str) -> None:
+    parsed = parse_rfc3339(value)
+
+    assert parsed == parse_rfc3339(f" {value[:-1]}+00:00")
+    assert parsed.tzinfo is timezone.utc
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2026-13-01T00:00:00Z",
+        "2026-02-30T00:00:00Z",
+        "20_6-02-01T00:00:00Z",
+    ],
+)
+def test_parse_rfc3339_rejects_invalid_canonical_shapes(value: str) -> None:
+    with pytest.raises(ValueError):
+        parse_rfc3339(value)
+
+
 def test_format_remaining_time_omits_zero_components() -> None:
     assert (
         format_remaining_time(